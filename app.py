@@ -3,7 +3,6 @@
 """
 
 import tkinter as tk
-from pathlib import Path
 from ui.main_window import MainWindow
 from core.file_processor import FileProcessor
 from core.qr_generator import QRGenerator
@@ -29,4 +28,7 @@ class QRMatrixSenderApp:
         
     def run(self):
         """アプリケーション実行"""
-        self.window.mainloop()
+        try:
+            self.window.mainloop()
+        finally:
+            self.qr_generator.close()
@@ -2,9 +2,14 @@
 ファイル処理モジュール
 """
 
+import math
+import gzip
 import base64
+import mmap
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 # Zstandard圧縮のインポート（オプション）
 try:
@@ -12,12 +17,118 @@ try:
     HAS_ZSTD = True
 except ImportError:
     HAS_ZSTD = False
-    import gzip
+
+# LZ4圧縮のインポート（オプション・低遅延用）
+try:
+    import lz4.frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+# 圧縮方式判定のために先頭から読むバイト数
+SNIFF_SIZE = 4096
+# これを超えるエントロピー（bit/byte）のデータは圧縮しない
+ENTROPY_THRESHOLD = 7.5
+# 圧縮済みフォーマットのマジックナンバー（zip/gzip/zstd/xz/bz2/7z/rar/jpeg/png/gif）
+COMPRESSED_MAGICS = (
+    b'PK\x03\x04', b'\x1f\x8b', b'\x28\xb5\x2f\xfd', b'\xfd7zXZ\x00', b'BZh',
+    b'7z\xbc\xaf\x27\x1c', b'Rar!', b'\xff\xd8\xff', b'\x89PNG', b'GIF8',
+)
+
+# これ以上のサイズのファイルはmmapで読み込む（小さいファイルはread()の方が速い）
+MMAP_THRESHOLD = 1024 * 1024
+
+# これ以上のサイズはブロック単位で独立したZstdフレームに分けて並列圧縮する
+# （圧縮方式 'zstd-frames'：受信側はフレームの連結としてストリーム復号する必要がある）
+FRAMED_THRESHOLD = 64 * 1024 * 1024
+FRAME_BLOCK_SIZE = 4 * 1024 * 1024
+
+# 学習済みZstd辞書の保存先（受信側にも同じ辞書を配置する）
+DICT_PATH = Path(__file__).resolve().parent.parent / 'zstd.dict'
+
+# Base45 (RFC 9285) の文字集合はQRの英数字モードと一致する
+BASE45_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+
+
+def b45encode(data: bytes) -> str:
+    """Base45エンコード（2バイト→3文字、端数1バイト→2文字）"""
+    charset = BASE45_CHARSET
+    out = []
+    for i in range(0, len(data) - 1, 2):
+        n = (data[i] << 8) | data[i + 1]
+        n, c = divmod(n, 45)
+        e, d = divmod(n, 45)
+        out.append(charset[c] + charset[d] + charset[e])
+    if len(data) % 2:
+        d, c = divmod(data[-1], 45)
+        out.append(charset[c] + charset[d])
+    return ''.join(out)
+
+
+def byte_entropy(data: bytes) -> float:
+    """バイト分布のシャノンエントロピー（bit/byte）"""
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(c / total * math.log2(c / total) for c in Counter(data).values())
+
+
+def is_precompressed(head: bytes) -> bool:
+    """既に圧縮済みのデータか（マジックナンバーまたは高エントロピー）"""
+    if head.startswith(COMPRESSED_MAGICS) or head[4:8] == b'ftyp':  # ftyp: mp4/mov
+        return True
+    return byte_entropy(head) > ENTROPY_THRESHOLD
+
 
 class FileProcessor:
-    def __init__(self, chunk_size=800, compression_level=3):
+    # 'base64': JSONに包んでバイトモード（既定・従来の受信側互換）
+    # 'base45': QR英数字モードで直接格納（約20%小さいQR）
+    # 'binary': 生バイトを種別+番号の固定ヘッダで包んでバイトモードに格納（最小のQR）
+    ENCODINGS = ('base64', 'base45', 'binary')
+    # 'auto': 圧縮済みデータは無圧縮、それ以外は zstd（なければ gzip）
+    # 'lz4': 圧縮率より速度を優先する対話用途向け
+    COMPRESSIONS = ('auto', 'zstd', 'gzip', 'lz4', 'none')
+    
+    def __init__(self, chunk_size=800, compression_level=3, encoding='base64', compression='auto'):
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"未対応のエンコーディング: {encoding}")
+        if (compression not in self.COMPRESSIONS
+                or (compression == 'zstd' and not HAS_ZSTD)
+                or (compression == 'lz4' and not HAS_LZ4)):
+            raise ValueError(f"未対応の圧縮方式: {compression}")
         self.chunk_size = chunk_size
         self.compression_level = compression_level
+        self.encoding = encoding
+        self.compression = compression
+        self._dict = None
+        if HAS_ZSTD and DICT_PATH.exists():
+            self._dict = zstd.ZstdCompressionDict(DICT_PATH.read_bytes())
+        self._build_compressor()
+        
+    def _build_compressor(self):
+        """圧縮コンテキスト構築（threads=-1: CPUコア数でブロック並列圧縮）"""
+        if HAS_ZSTD:
+            self._cctx = zstd.ZstdCompressor(
+                level=self.compression_level, threads=-1,
+                write_content_size=True, dict_data=self._dict
+            )
+            
+    def train_dict(self, sample_files: List[str], dict_size=16384):
+        """類似ファイル群からZstd辞書を学習して保存（小さいファイルの圧縮率向上）"""
+        if not HAS_ZSTD:
+            print("辞書学習にはzstandardが必要です")
+            return None
+            
+        try:
+            samples = [Path(p).read_bytes() for p in sample_files]
+            self._dict = zstd.train_dictionary(dict_size, samples)
+            DICT_PATH.write_bytes(self._dict.as_bytes())
+            self._build_compressor()
+            return self._dict
+            
+        except Exception as e:
+            print(f"辞書学習エラー: {str(e)}")
+            return None
         
     def process_file(self, file_path: str) -> Optional[Dict[str, Any]]:
         """ファイル処理"""
@@ -26,23 +137,32 @@ class FileProcessor:
             return None
             
         try:
-            # ファイル読み込み
+            # ファイル読み込み＋圧縮（大きいファイルはmmapで全体をコピーせず圧縮器に渡す）
             with open(path, 'rb') as f:
-                file_data = f.read()
+                file_size = path.stat().st_size
+                if file_size >= MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                            memoryview(mm) as view:
+                        compression_type = self.select_compression(view[:SNIFF_SIZE], file_size)
+                        compressed_data = self.compress_data(view, compression_type)
+                else:
+                    file_data = f.read()
+                    compression_type = self.select_compression(file_data[:SNIFF_SIZE], file_size)
+                    compressed_data = self.compress_data(file_data, compression_type)
             
-            file_size = len(file_data)
-            
-            # 圧縮
-            compressed_data = self.compress_data(file_data)
             compressed_size = len(compressed_data)
             
-            # Base64エンコード
-            encoded_data = base64.b64encode(compressed_data).decode('utf-8')
-            
-            # チャンク分割
-            chunks = []
-            for i in range(0, len(encoded_data), self.chunk_size):
-                chunks.append(encoded_data[i:i + self.chunk_size])
+            # エンコード＋チャンク分割
+            cs = self.chunk_size
+            if self.encoding == 'binary':
+                chunks = [compressed_data[i:i + cs] for i in range(0, compressed_size, cs)]
+            elif self.encoding == 'base45':
+                encoded_data = b45encode(compressed_data)
+                chunks = [encoded_data[i:i + cs] for i in range(0, len(encoded_data), cs)]
+            else:
+                # バイト列のまま分割し、チャンク単位でデコード（巨大なstrを作らない）
+                encoded_data = base64.b64encode(compressed_data)
+                chunks = [encoded_data[i:i + cs].decode('ascii') for i in range(0, len(encoded_data), cs)]
             
             return {
                 'file_name': path.name,
@@ -50,17 +170,62 @@ class FileProcessor:
                 'original_size': file_size,
                 'compressed_size': compressed_size,
                 'chunks': chunks,
-                'compression_type': 'zstd' if HAS_ZSTD else 'gzip'
+                'compression_type': compression_type,
+                'encoding': self.encoding,
+                'dict_id': self._dict.dict_id() if self._dict and compression_type.startswith('zstd') else 0,
+                # 'zstd-frames' の非圧縮ブロックサイズ（それ以外は0）
+                'frame_size': FRAME_BLOCK_SIZE if compression_type == 'zstd-frames' else 0
             }
             
         except Exception as e:
             print(f"ファイル処理エラー: {str(e)}")
             return None
             
-    def compress_data(self, data: bytes) -> bytes:
+    def select_compression(self, head: bytes, size: int = 0) -> str:
+        """先頭データとファイルサイズから圧縮方式を決定"""
+        if self.compression != 'auto':
+            compression_type = self.compression
+        elif is_precompressed(bytes(head)):
+            return 'none'
+        else:
+            compression_type = 'zstd' if HAS_ZSTD else 'gzip'
+        # 大きいファイルのzstdは複数フレームに分けて並列圧縮する
+        if compression_type == 'zstd' and size >= FRAMED_THRESHOLD:
+            return 'zstd-frames'
+        return compression_type
+        
+    def compress_data(self, data: bytes, compression_type: Optional[str] = None) -> bytes:
         """データ圧縮"""
-        if HAS_ZSTD:
-            cctx = zstd.ZstdCompressor(level=self.compression_level)
-            return cctx.compress(data)
+        if compression_type is None:
+            compression_type = 'zstd' if HAS_ZSTD else 'gzip'
+            
+        if compression_type == 'none':
+            return bytes(data)
+        elif compression_type == 'lz4':
+            return lz4.frame.compress(data)
+        elif compression_type == 'zstd-frames':
+            return self._compress_framed(data)
+        elif compression_type == 'zstd':
+            return self._cctx.compress(data)
         else:
             return gzip.compress(data, compresslevel=self.compression_level)
+            
+    def _compress_framed(self, data) -> bytes:
+        """ブロックごとに独立したZstdフレームへ並列圧縮して連結
+        
+        フレームの連結はストリーム復号（ZstdDecompressor().stream_reader 等）なら1つのデータとして
+        復号できるが、単発の decompress() は先頭フレームしか返さないため圧縮方式を 'zstd-frames' と区別する。
+        zstandardは圧縮中にGILを解放するため、スレッドで並列化できる。
+        """
+        view = memoryview(data)
+        blocks = [view[i:i + FRAME_BLOCK_SIZE] for i in range(0, len(view), FRAME_BLOCK_SIZE)]
+        
+        def compress_block(block):
+            # ZstdCompressorはスレッド間で共有できないためブロックごとに作成
+            cctx = zstd.ZstdCompressor(
+                level=self.compression_level, write_content_size=True, dict_data=self._dict
+            )
+            return cctx.compress(block)
+            
+        with ThreadPoolExecutor() as pool:
+            return b''.join(pool.map(compress_block, blocks))
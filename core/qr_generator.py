@@ -2,59 +2,606 @@
 QRコード生成モジュール（簡略化版）
 """
 
+import os
 import json
+import multiprocessing
+import functools
 import time
 import threading
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+import tkinter as tk
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, ImageColor
 import segno
-from io import BytesIO
-from typing import Dict, Any, Callable, Tuple
+from typing import Dict, Any, Callable, Optional, Tuple
+from .qrencode import HAS_QRENCODE, encode_matrix
+
+# orjson のインポート（オプション）
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Numba のインポート（オプション・タイル拡大のJIT化）
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+WHITE_RGB = (255, 255, 255)
+BLACK_RGB = (0, 0, 0)
+GRID_RGB = ImageColor.getrgb('lightgray')
+
+# 4隅の制御QR: 位置 -> (前景色, 背景色, ラベル色, ラベル)
+CONTROL_QR_STYLES = {
+    'top-left': (ImageColor.getrgb('blue'), ImageColor.getrgb('lightblue'), 'blue', "制御-左上"),
+    'top-right': (ImageColor.getrgb('red'), ImageColor.getrgb('pink'), 'red', "制御-右上"),
+    'bottom-left': (ImageColor.getrgb('orange'), ImageColor.getrgb('#FFE5B4'), 'orange', "制御-左下"),
+    'bottom-right': (ImageColor.getrgb('green'), ImageColor.getrgb('lightgreen'), 'green', "制御-右下"),
+}
+
+
+def _dumps(obj) -> str:
+    """JSONシリアライズ（orjsonがあれば使用）"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj)
+
+
+# チャンクデータはBase64のためJSONエスケープ不要、テンプレートで直接組み立てる
+CHUNK_PAYLOAD_TEMPLATE = '{"type":"chunk","chunkIndex":%d,"data":"%s"}'
+# Base45チャンクは「番号:データ」の英数字ペイロード（先頭の':'までが番号）
+CHUNK_PAYLOAD_TEMPLATE_B45 = '%d:%s'
+# バイナリチャンクの種別タグ（後ろに番号uint32ビッグエンディアン＋生データが続く）
+CHUNK_TAG_BINARY = b'\x01'
+
+# 生成進捗をUIへ反映する間隔の下限（約30Hz、間の値は最新値に上書きされる）
+PROGRESS_INTERVAL_NS = 33_000_000
+
+
+def pack_chunk(index: int, raw: bytes) -> bytes:
+    """バイナリチャンクのペイロード（種別1バイト＋番号4バイト＋生データ）"""
+    return CHUNK_TAG_BINARY + index.to_bytes(4, 'big') + raw
+
+
+def _chunk_payload(template, index, data):
+    """チャンクのQRペイロード（テンプレートがNoneならバイナリ形式）"""
+    if template is None:
+        return pack_chunk(index, data)
+    return template % (index, data)
+
+
+def _min_version(payload, error, mode=None):
+    """ペイロードが収まる最小のQRバージョン"""
+    return segno.make(payload, error=error, mode=mode, boost_error=False).version
+
+
+@functools.lru_cache(maxsize=1024)
+def _encode_qr_modules(payload, error='m', mode=None, version=None):
+    """QRのモジュール行列を (一辺, bytes) で返す（同一ペイロードはキャッシュから再利用）
+    
+    ndarrayは呼び出し側で書き換えられる恐れがあるため、不変のbytesで保持する。
+    version を指定した場合はバージョン探索と誤り訂正レベルの自動引き上げを省略する。
+    """
+    # libqrencode（C実装）を有効化していれば優先し、なければ segno で生成
+    modules = encode_matrix(payload, error, version or 0) if HAS_QRENCODE else None
+    if modules is not None:
+        return modules.shape[0], modules.tobytes()
+    if version:
+        qr = segno.make(payload, error=error, mode=mode, version=version, boost_error=False)
+    else:
+        qr = segno.make(payload, error=error, mode=mode)
+    # 行ごとのbytearrayを一度で連結
+    return len(qr.matrix), b''.join(qr.matrix)
+
+
+def _render_qr_array(payload, size, border, dark_rgb, light_rgb=WHITE_RGB, error='m', mode=None,
+                     version=None):
+    """QRコードを segno のモジュール行列から直接 size x size のRGB配列に描画
+    
+    PNGエンコード/デコードとPILのリサイズを経由しない。1モジュール2px以上取れる
+    場合は整数倍率で拡大して余りを背景色で中央寄せ（モジュール幅が均一になる）、
+    取れない場合はインデックス参照による最近傍拡大で size に合わせる。
+    """
+    side, buf = _encode_qr_modules(payload, error, mode, version)
+    modules = np.frombuffer(buf, np.uint8).reshape(side, side)
+    return _modules_to_rgb(modules, size, border, dark_rgb, light_rgb)
+
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _expand_rgb(mat, idx, lut, out):
+        """out[y, x] = lut[mat[idx[y], idx[x]]] を一つのループで書き込む"""
+        size = idx.shape[0]
+        for y in range(size):
+            row = mat[idx[y]]
+            for x in range(size):
+                color = lut[row[idx[x]]]
+                out[y, x, 0] = color[0]
+                out[y, x, 1] = color[1]
+                out[y, x, 2] = color[2]
+
+
+def _modules_to_rgb(modules, size, border, dark_rgb, light_rgb=WHITE_RGB):
+    """モジュール行列（1=暗）を余白付きで size x size のRGB配列に拡大"""
+    side = modules.shape[0]
+    # 余白込みの配列へ直接書き込む
+    n = side + border * 2
+    mat = np.zeros((n, n), np.uint8)
+    mat[border:border + side, border:border + side] = modules
+    k = size // n
+    
+    if HAS_NUMBA and border:
+        # 出力画素 -> モジュールの対応表を作り、拡大と着色をJITカーネルで一度に行う
+        # （中央寄せの余りは範囲外を余白モジュールに丸めて背景色にする）
+        if k >= 2:
+            before = (size - n * k) // 2
+            idx = np.clip((np.arange(size) - before) // k, 0, n - 1)
+        else:
+            idx = np.arange(size) * n // size
+        out = np.empty((size, size, 3), np.uint8)
+        _expand_rgb(mat, idx, np.array((light_rgb, dark_rgb), np.uint8), out)
+        return out
+    
+    # 2色のLUTを引いてRGB化（np.where のブロードキャストより軽い）
+    lut = np.array((light_rgb, dark_rgb), np.uint8)
+    if k >= 2:
+        # モジュール単位で着色してから出力配列へ一度だけ拡大書き込みする
+        # （出力の中央部分を (n, k, n, k, 3) のビューとして扱い、余りの帯だけ背景色で埋める）
+        nk = n * k
+        before = (size - nk) // 2
+        end = before + nk
+        out = np.empty((size, size, 3), np.uint8)
+        out[:before] = light_rgb
+        out[end:] = light_rgb
+        out[before:end, :before] = light_rgb
+        out[before:end, end:] = light_rgb
+        out[before:end, before:end].reshape(n, k, n, k, 3)[...] = lut[mat][:, None, :, None]
+        return out
+    idx = np.arange(size) * n // size
+    return lut[mat[np.ix_(idx, idx)]]
+
+
+def _pack_modules(modules):
+    """モジュール行列をキャッシュ用に (一辺, ビットパック済みbytes) へ圧縮"""
+    return modules.shape[0], np.packbits(modules).tobytes()
+
+
+def _unpack_modules(packed):
+    """_pack_modules の逆変換"""
+    side, buf = packed
+    return np.unpackbits(np.frombuffer(buf, np.uint8), count=side * side).reshape(side, side)
+
+
+def _to_photo_image(img, reuse=None):
+    """RGB画像をPPM(P6)としてTkのPhotoImageへ直接渡す（ImageTkを経由しない）
+    
+    同じサイズの reuse を渡した場合は新しく作らず、その画像の内容を差し替えて返す。
+    """
+    width, height = img.size
+    data = b'P6 %d %d 255\n' % (width, height) + img.tobytes()
+    if reuse is not None and (reuse.width(), reuse.height()) == (width, height):
+        reuse.configure(data=data)
+        return reuse
+    return tk.PhotoImage(data=data)
+
+
+def _to_bitmap_image(img):
+    """白黒の画像をTkのBitmapImage（1bit/画素）として渡す
+
+    XBMは立っているビットが前景色になるため、暗い画素を1にして黒で描かせる。
+    """
+    mono = img.convert('L').point(lambda v: 255 if v < 128 else 0, '1')
+    return tk.BitmapImage(data=mono.tobitmap(), foreground='black', background='white')
+
+
+def _control_payload(position, page_number, total_pages):
+    """制御QRの内容"""
+    return {
+        "type": "control",
+        "position": position,
+        "page": page_number,
+        "total": total_pages
+    }
+
+
+def _render_control_tiles(page_number, total_pages, tile_size, control_version):
+    """4隅の制御QRタイル生成（位置 -> RGB配列）"""
+    return {
+        position: _render_qr_array(
+            _dumps(_control_payload(position, page_number, total_pages)),
+            tile_size, 1, dark, light, 'm', None, control_version
+        )
+        for position, (dark, light, color, label) in CONTROL_QR_STYLES.items()
+    }
+
+
+@functools.lru_cache(maxsize=16)
+def _grid_mask(cols, rows, qr_size, padding):
+    """グリッド線のマスク画像（ページ形状ごとに一度だけ作成）"""
+    width = cols * qr_size + padding * 2
+    height = rows * qr_size + padding * 2 + 50
+    mask = Image.new('1', (width, height), 0)
+    draw = ImageDraw.Draw(mask)
+    for i in range(cols + 1):
+        x = i * qr_size + padding
+        draw.line([(x, 50), (x, height)], fill=1, width=1)
+    for i in range(rows + 1):
+        y = i * qr_size + padding + 50
+        draw.line([(0, y), (width, y)], fill=1, width=1)
+    return mask
+
+
+# ページサイズ -> 描画用キャンバス（ワーカープロセス内でページ間に使い回す）
+_CANVAS_POOL = {}
+
+
+def _page_canvas(height, width):
+    """白で塗りつぶしたページ用キャンバス（同じサイズなら確保済みの配列を再利用）
+    
+    Image.fromarray はRGB配列をコピーするため、画像化した後は次のページで上書きしてよい。
+    """
+    canvas = _CANVAS_POOL.get((height, width))
+    if canvas is None:
+        canvas = _CANVAS_POOL[(height, width)] = np.empty((height, width, 3), np.uint8)
+    canvas.fill(255)
+    return canvas
+
+
+@functools.lru_cache(maxsize=None)
+def _load_font(size):
+    """フォント読み込み（プロセスごとにサイズ単位で一度だけ）"""
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except:
+        return ImageFont.load_default()
+
+
+def _render_page(start_index, page_chunks, cols, rows, page_number, total_pages, qr_size,
+                 chunk_template, chunk_mode, chunk_version, control_version, cached_modules=None):
+    """写真撮影に最適化されたQRマトリックス（4隅に制御QR）を1ページ分描画
+    
+    ページ単位でワーカープロセスに投げるため、(サイズ, RGB生バイト列, 新規モジュール) を返す。
+    cached_modules（チャンク番号 -> パック済みモジュール）にあるチャンクはQR生成を省略し、
+    新たに生成したチャンクのモジュールは呼び出し側でキャッシュできるよう返す。
+    """
+    cached_modules = cached_modules or {}
+    new_modules = {}
+    padding = 5
+    matrix_width = cols * qr_size + padding * 2
+    matrix_height = rows * qr_size + padding * 2 + 50  # ヘッダー用のスペース
+    # タイルはNumPy配列に直接書き込み、最後に一度だけPIL画像化する
+    canvas = _page_canvas(matrix_height, matrix_width)
+    
+    font = _load_font(24)
+    small_font = _load_font(12)
+    
+    tile_size = qr_size - 10
+    
+    # 列/行の座標を一度だけ計算し、タイル位置（左上座標）を行優先で列挙
+    xs = [col * qr_size + padding for col in range(cols)]
+    ys = [row * qr_size + padding + 50 for row in range(rows)]  # ヘッダー分のオフセット
+    slots = [(x, y) for y in ys for x in xs]
+    # 4隅: 位置 -> (スロット番号, ラベルのアンカー, ラベルのyオフセット)
+    # 上段はQRの下、下段はQRの上にラベル
+    corners = {
+        'top-left': (0, "mt", qr_size + 2),
+        'top-right': (cols - 1, "mt", qr_size + 2),
+        'bottom-left': ((rows - 1) * cols, "mb", -2),
+        'bottom-right': (rows * cols - 1, "mb", -2),
+    }
+    
+    # 残りのスロットにチャンク番号を順に対応付ける
+    corner_slots = {slot for slot, anchor, dy in corners.values()}
+    chunk_slots = [pos for i, pos in enumerate(slots) if i not in corner_slots]
+    chunk_count = min(len(chunk_slots), len(page_chunks))
+    
+    labels = []
+    for (x, y), chunk_index, chunk in zip(chunk_slots, range(start_index, start_index + chunk_count), page_chunks):
+        packed = cached_modules.get(chunk_index)
+        if packed is None:
+            side, buf = _encode_qr_modules(
+                _chunk_payload(chunk_template, chunk_index, chunk), 'h', chunk_mode, chunk_version
+            )
+            modules = np.frombuffer(buf, np.uint8).reshape(side, side)
+            new_modules[chunk_index] = _pack_modules(modules)
+        else:
+            modules = _unpack_modules(packed)
+        tile = _modules_to_rgb(modules, tile_size, 1, BLACK_RGB, WHITE_RGB)
+        canvas[y + 5:y + 5 + tile_size, x + 5:x + 5 + tile_size] = tile
+        # チャンク番号を表示
+        labels.append(((x + qr_size // 2, y + qr_size // 2), 
+                       str(chunk_index), "red", font, "mm"))
+    
+    # 4隅の制御QRコード（データ配置の後にまとめて描画）
+    control_tiles = _render_control_tiles(page_number, total_pages, tile_size, control_version)
+    for position, (slot, anchor, dy) in corners.items():
+        x, y = slots[slot]
+        dark, light, color, label = CONTROL_QR_STYLES[position]
+        canvas[y + 5:y + 5 + tile_size, x + 5:x + 5 + tile_size] = control_tiles[position]
+        labels.append(((x + qr_size // 2, y + dy), label, color, small_font, anchor))
+    
+    # 空のスペースに「終了」マーク
+    empty_slots = []
+    for x, y in chunk_slots[chunk_count:]:
+        empty_slots.append([x + 5, y + 5, x + qr_size - 5, y + qr_size - 5])
+        labels.append(((x + qr_size // 2, y + qr_size // 2), 
+                       "空", "gray", font, "mm"))
+    
+    matrix = Image.fromarray(canvas, 'RGB')
+    draw = ImageDraw.Draw(matrix)
+    
+    # ヘッダー情報を描画
+    header_text = f"ページ {page_number}/{total_pages} - チャンク {start_index + 1}-{start_index + chunk_count}"
+    draw.text((matrix_width // 2, 25), header_text, fill="black", font=font, anchor="mm")
+    
+    for rect in empty_slots:
+        draw.rectangle(rect, outline="gray", width=2)
+    
+    for xy, text, fill, label_font, anchor in labels:
+        draw.text(xy, text, fill=fill, font=label_font, anchor=anchor)
+        
+    # グリッド線を描画（デバッグ用・ページ形状ごとのマスクで一度に塗る）
+    matrix.paste(GRID_RGB, (0, 0), _grid_mask(cols, rows, qr_size, padding))
+        
+    return matrix.size, matrix.tobytes(), new_modules
+
 
 class QRGenerator:
     def __init__(self):
         self.file_data = None
-        self.qr_images = {}
-        self.qr_images_lock = threading.Lock()
+        self.header_base = None
+        # 生成済み画像（PIL）：ヘッダーとページ単位の固定長リスト
+        # （書き込みはTkスレッドのスロット代入のみ、読み出しはインデックス参照のみなのでロック不要）
+        self._header = None
+        self._frames = []
+        self._qr_per_page = 0
+        # _frames を生成したときのレイアウト (列数, 行数, QRサイズ)
+        self._frames_layout = None
+        # _frames が現在のファイルで最後まで生成し終えたものか（再利用の条件）
+        self._frames_complete = False
+        # チャンク/制御QRのペイロード形式と事前計算したQRバージョン
+        self._chunk_template = CHUNK_PAYLOAD_TEMPLATE
+        self._chunk_mode = 'byte'
+        self._chunk_version = None
+        self._control_version = None
+        # チャンク番号 -> パック済みモジュール行列（再生成時にQR生成を省略）
+        self._module_cache = {}
+        # 生成の世代番号（ファイル設定/生成開始ごとに進め、古い生成スレッドの書き込みを捨てる）
+        self._generation = 0
+        # PhotoImageは表示時に作成し、直近の数枚だけ保持する
+        self._photo_cache = OrderedDict()
+        self.photo_cache_size = 4
+        # ヘッダーのTk画像は開始/停止のたびに表示するため、ページのLRUとは別に常に保持する
+        self._header_photo = None
+        # 生成完了後に事前作成したページのPhotoImage（ページ番号 -> PhotoImage）
+        self._pages = {}
+        # 事前作成に使うメモリの上限（Tkは1画素4バイトで保持する）
+        self.prebuild_bytes = 128 * 1024 * 1024
         self.is_generating = False
+        # 生成スレッド -> Tkスレッドへの受け渡し (世代番号, キー, 画像)
+        # （単一の生産者/消費者なので、GIL下でアトミックなdequeのappend/popleftで足りる）
+        self._pending = deque()
+        self._complete_callback = None
+        self._page_ready_callback = None
+        # 進捗は生成スレッドが最新値だけを書き込み、drain_pending() で反映する
+        self._progress_callback = None
+        self._latest_progress = None
+        self._shown_progress = None
+        self._shown_progress_ns = 0
         # 写真撮影用に最適化されたサイズ
         self.photo_optimized_qr_size = 150
+        # ページ描画はCPU律速のためプロセスプールで並列化（初回生成時に作成し、ファイル間で使い回す）
+        self.executor = None
         
     def set_file_data(self, file_data: Dict[str, Any]):
-        """ファイルデータ設定"""
+        """ファイルデータ設定（生成中は変更できないためFalseを返す）"""
+        if self.is_generating:
+            print("QR生成中のためファイルを変更できません")
+            return False
+            
+        self._generation += 1
+        # 同じファイルの再選択ならチャンクのQRキャッシュと生成済みページを引き継ぐ
+        if (not self.file_data
+                or self.file_data.get('encoding') != file_data.get('encoding')
+                or self.file_data['chunks'] != file_data['chunks']):
+            self._module_cache = {}
+            self._frames = []
+            self._frames_layout = None
+            self._frames_complete = False
         self.file_data = file_data
-        self.qr_images.clear()
+        self._header = None
+        self._header_photo = None
+        self._photo_cache.clear()
+        self._pages = {}
+        # ヘッダーの固定部分はファイル単位で一度だけ組み立てる
+        self.header_base = {
+            "type": "header",
+            "fileName": file_data['file_name'],
+            "fileType": file_data['file_type'],
+            "originalSize": file_data['original_size'],
+            "compressedSize": file_data['compressed_size'],
+            "compressed": file_data['compression_type'] != 'none',
+            "compressionType": file_data['compression_type'],
+            "totalChunks": len(file_data['chunks']),
+            "chunkSize": len(file_data['chunks'][0]) if file_data['chunks'] else 0,
+            "encoding": file_data.get('encoding', 'base64'),
+            "dictId": file_data.get('dict_id', 0),
+            "frameSize": file_data.get('frame_size', 0),
+        }
+        
+        if file_data.get('encoding') == 'base45':
+            self._chunk_template, self._chunk_mode = CHUNK_PAYLOAD_TEMPLATE_B45, 'alphanumeric'
+        elif file_data.get('encoding') == 'binary':
+            self._chunk_template, self._chunk_mode = None, 'byte'
+        else:
+            self._chunk_template, self._chunk_mode = CHUNK_PAYLOAD_TEMPLATE, 'byte'
+        # 最大長のチャンク（最大の番号＋最長データ）が収まるバージョンを全チャンクで使う
+        chunks = file_data['chunks']
+        if chunks:
+            sample = _chunk_payload(self._chunk_template, len(chunks) - 1, max(chunks, key=len))
+            self._chunk_version = _min_version(sample, 'h', self._chunk_mode)
+        else:
+            self._chunk_version = None
+        return True
+        
+    def _get_executor(self):
+        """ワーカープロセスのプール取得（なければ作成）
+        
+        Tkやスレッドを抱えたプロセスをforkしないよう spawn で起動する。
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn')
+            )
+        return self.executor
+        
+    def close(self):
+        """ワーカープロセスの終了とTk画像の解放（アプリ終了時に呼ぶ）"""
+        self._header_photo = None
+        self._pages = {}
+        self._photo_cache.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            
+    def page_layout(self, matrix_size: Tuple[int, int, int], chunk_count: Optional[int] = None):
+        """写真モードのページ構成 (列数, 行数, データQR/ページ, 総ページ数)
+        
+        chunk_count を省略した場合は設定済みファイルのチャンク数を使う。
+        """
+        cols, rows, qr_per_frame = matrix_size
+        
+        # 写真モード用のグリッドサイズを使用
+        max_cols = max(5, cols)  # 最低5列
+        max_rows = max(4, rows)  # 最低4行
+        
+        # 4隅の制御QR分を引く（実際の配置に基づく）
+        qr_per_page = (max_cols * max_rows) - 4
+        if chunk_count is None:
+            chunk_count = self.get_chunk_count()
+        total_pages = (chunk_count + qr_per_page - 1) // qr_per_page
+        return max_cols, max_rows, qr_per_page, total_pages
         
     def generate_all_qrcodes(self, matrix_size: Tuple[int, int, int], 
                            progress_callback: Callable, 
-                           complete_callback: Callable):
-        """すべてのQRコード生成"""
+                           complete_callback: Callable,
+                           page_ready_callback: Optional[Callable] = None):
+        """すべてのQRコード生成（開始した場合True）
+        
+        生成された画像は drain_pending() をTkスレッドから定期的に呼んで取り込む。
+        page_ready_callback(key) は画像を1枚取り込むごとに呼ばれる（key は 'header' またはページ番号）。
+        progress_callback と complete_callback も drain_pending() 内（Tkスレッド）で呼ばれる。
+        """
         if self.is_generating or not self.file_data:
-            return
+            return False
             
         self.is_generating = True
-        cols, rows, qr_per_frame = matrix_size
+        self._generation += 1
+        self._progress_callback = progress_callback
+        self._latest_progress = None
+        self._shown_progress = None
+        self._shown_progress_ns = 0
+        self._complete_callback = complete_callback
+        self._page_ready_callback = page_ready_callback
+        max_cols, max_rows, adjusted_qr_per_frame, total_pages = self.page_layout(matrix_size)
+        
+        # 制御QRは最長の位置名と最大のページ番号で必要バージョンを決める
+        self._control_version = _min_version(
+            _dumps(_control_payload('bottom-right', total_pages, total_pages)), 'm'
+        )
+        
+        # チャンクとレイアウトが前回と同じで、前回の生成が完了していれば生成済みページを再利用する
+        layout = (max_cols, max_rows, self.photo_optimized_qr_size)
+        if self._frames_complete and layout == self._frames_layout and len(self._frames) == total_pages:
+            reused = self._frames
+        else:
+            reused = [None] * total_pages
+        self._frames_complete = False
+        # 取り込まれていない前回の生成結果は捨てる
+        self._pending.clear()
+        
+        # ページ数が確定した時点で格納先を確保
+        self._qr_per_page = adjusted_qr_per_frame
+        self._header = None
+        self._header_photo = None
+        self._frames = [None] * total_pages
+        self._frames_layout = layout
+        self._photo_cache.clear()
+        self._pages = {}
         
         # バックグラウンドで生成
         thread = threading.Thread(
             target=self._generate_thread,
-            args=(cols, rows, qr_per_frame, progress_callback, complete_callback)
+            args=(max_cols, max_rows, adjusted_qr_per_frame, total_pages, self._set_progress, reused,
+                  self._generation)
         )
         thread.daemon = True
         thread.start()
+        return True
+        
+    def drain_pending(self, max_items=16):
+        """生成済み画像を登録（Tkスレッドから呼ぶ）
+        
+        生成が続いている間はTrue、終了済みならFalseを返す。
+        """
+        self._apply_progress()
+        for _ in range(max_items):
+            try:
+                generation, key, img = self._pending.popleft()
+            except IndexError:
+                return True
+                
+            if generation != self._generation:
+                # 以前の生成の残り
+                continue
+            if key is None:
+                # 終端マーカー（img は成功フラグ）
+                self._apply_progress(force=True)
+                self._frames_complete = bool(img)
+                if img and self._complete_callback:
+                    self._complete_callback()
+                return False
+                
+            if key == 'header':
+                self._header = img
+                self._header_photo = None
+            elif key < len(self._frames):
+                self._frames[key] = img
+            else:
+                continue
+            if self._page_ready_callback:
+                self._page_ready_callback(key)
+        return True
+        
+    def _set_progress(self, progress, message):
+        """進捗の記録（生成スレッドから呼ぶ。Tkには触れず最新値で上書きするだけ）"""
+        self._latest_progress = (progress, message)
+        
+    def _apply_progress(self, force=False):
+        """記録された最新の進捗をUIへ反映（Tkスレッドから呼ぶ）
         
-    def _generate_thread(self, cols, rows, qr_per_frame, progress_callback, complete_callback):
+        前回の反映から PROGRESS_INTERVAL_NS 未満なら見送り、次回の呼び出しで最新値を反映する。
+        """
+        latest = self._latest_progress
+        if latest is not None and latest is not self._shown_progress:
+            now = time.monotonic_ns()
+            if not force and now - self._shown_progress_ns < PROGRESS_INTERVAL_NS:
+                return
+            self._shown_progress = latest
+            self._shown_progress_ns = now
+            self._progress_callback(*latest)
+            
+    def _generate_thread(self, max_cols, max_rows, adjusted_qr_per_frame, total_pages, progress_callback,
+                         reused, generation):
         """生成スレッド"""
+        success = False
         try:
             chunks = self.file_data['chunks']
             
-            # 写真モード用のグリッドサイズを使用
-            max_cols = max(5, cols)  # 最低5列
-            max_rows = max(4, rows)  # 最低4行
-            
-            # 4隅の制御QR分を引く（実際の配置に基づく）
-            adjusted_qr_per_frame = (max_cols * max_rows) - 4
-            total_pages = (len(chunks) + adjusted_qr_per_frame - 1) // adjusted_qr_per_frame
-            
             print(f"=== QR生成設定 ===")
             print(f"グリッド: {max_cols}x{max_rows} = {max_cols * max_rows}個")
             print(f"制御QR: 4個")
@@ -64,216 +611,136 @@ class QRGenerator:
             
             # ヘッダー生成（総ページ数を含む）
             progress_callback(0, "ヘッダーQRコード生成中...")
-            header_img = self._create_header_qr(total_pages)
-            with self.qr_images_lock:
-                self.qr_images['header'] = header_img
+            self._pending.append((generation, 'header', self._create_header_qr(total_pages)))
             progress_callback(10, "ヘッダー生成完了")
             
             # チャンクマトリックス生成（写真モード）
             self._generate_photo_optimized_matrices(
-                chunks, max_cols, max_rows, progress_callback, adjusted_qr_per_frame, total_pages
+                chunks, max_cols, max_rows, progress_callback, adjusted_qr_per_frame, total_pages, reused,
+                generation
             )
-                
-            complete_callback()
+            success = True
             
         finally:
             self.is_generating = False
+            self._pending.append((generation, None, success))
     
-    def _generate_photo_optimized_matrices(self, chunks, cols, rows, progress_callback, adjusted_qr_per_frame, total_pages):
-        """写真撮影に最適化されたマトリックス生成"""
-        # より多くのQRコードを配置するための計算
-        max_cols = max(5, cols)  # 最低5列
-        max_rows = max(4, rows)  # 最低4行
+    def _generate_photo_optimized_matrices(self, chunks, cols, rows, progress_callback, adjusted_qr_per_frame, total_pages,
+                                           reused, generation):
+        """写真撮影に最適化されたマトリックス生成（reused にあるページは描画を省略）
         
+        モジュールキャッシュへの書き込みは generation が現在の世代の場合だけ行う。
+        """
         total_count = len(chunks)
         current_count = 0
         
-        for i in range(0, len(chunks), adjusted_qr_per_frame):
-            page_number = (i // adjusted_qr_per_frame) + 1
-            
-            msg = f"写真用マトリックス生成中... ページ {page_number}/{total_pages}"
-            progress = 10 + (current_count / total_count) * 90
-            progress_callback(progress, msg)
-            
-            matrix_img = self._create_photo_optimized_matrix(
-                i, max_cols, max_rows, adjusted_qr_per_frame, page_number, total_pages
-            )
-            photo = ImageTk.PhotoImage(matrix_img)
-            
-            with self.qr_images_lock:
-                self.qr_images[i] = photo
-            
-            current_count += min(adjusted_qr_per_frame, len(chunks) - i)
+        # ページごとに独立しているため全ページをワーカープロセスへ投入し、順に受け取る
+        futures = [
+            None if reused[page_index] is not None
+            else self._get_executor().submit(_render_page, **self._page_args(
+                i, cols, rows, adjusted_qr_per_frame, page_index + 1, total_pages
+            ))
+            for page_index, i in enumerate(range(0, len(chunks), adjusted_qr_per_frame))
+        ]
+        try:
+            for page_index, future in enumerate(futures):
+                if future is None:
+                    img = reused[page_index]
+                else:
+                    size, data, new_modules = future.result()
+                    if generation == self._generation:
+                        self._module_cache.update(new_modules)
+                    img = Image.frombytes('RGB', size, data)
+                self._pending.append((generation, page_index, img))
+                
+                current_count += min(adjusted_qr_per_frame, total_count - page_index * adjusted_qr_per_frame)
+                msg = f"写真用マトリックス生成中... ページ {page_index + 1}/{total_pages}"
+                progress = 10 + (current_count / total_count) * 90
+                progress_callback(progress, msg)
+        finally:
+            # 失敗時は未着手のページを取り消す
+            for future in futures:
+                if future is not None:
+                    future.cancel()
             
     def _create_header_qr(self, total_pages):
         """ヘッダーQRコード生成（総ページ数を含む）"""
-        header_info = {
-            "type": "header",
-            "fileName": self.file_data['file_name'],
-            "fileType": self.file_data['file_type'],
-            "originalSize": self.file_data['original_size'],
-            "compressedSize": self.file_data['compressed_size'],
-            "compressed": True,
-            "compressionType": self.file_data['compression_type'],
-            "totalChunks": len(self.file_data['chunks']),
-            "chunkSize": len(self.file_data['chunks'][0]) if self.file_data['chunks'] else 0,
-            "totalPages": total_pages,  # 総ページ数（必要な写真枚数）を追加
-            "timestamp": int(time.time())
-        }
+        header_info = dict(
+            self.header_base,
+            totalPages=total_pages,  # 総ページ数（必要な写真枚数）を追加
+            timestamp=int(time.time())
+        )
         
-        qr = segno.make(json.dumps(header_info), error='m')
-        buffer = BytesIO()
-        qr.save(buffer, kind='png', scale=10, border=4)
-        buffer.seek(0)
-        img = Image.open(buffer)
-        img = img.resize((600, 600), Image.Resampling.NEAREST)
-        return ImageTk.PhotoImage(img)
+        rgb = _render_qr_array(_dumps(header_info), 600, 4, BLACK_RGB, error='m')
+        return Image.fromarray(rgb, 'RGB')
     
-    def _create_photo_optimized_matrix(self, start_index, cols, rows, qr_per_frame, page_number, total_pages):
-        """写真撮影に最適化されたQRマトリックス（4隅に制御QR）"""
-        qr_size = self.photo_optimized_qr_size
-        padding = 5
-        matrix_width = cols * qr_size + padding * 2
-        matrix_height = rows * qr_size + padding * 2 + 50  # ヘッダー用のスペース
-        matrix = Image.new('RGB', (matrix_width, matrix_height), 'white')
-        draw = ImageDraw.Draw(matrix)
-        
-        # ヘッダー情報を描画
-        try:
-            font = ImageFont.truetype("arial.ttf", 24)
-            small_font = ImageFont.truetype("arial.ttf", 12)
-        except:
-            font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
-        
-        header_text = f"ページ {page_number}/{total_pages} - チャンク {start_index + 1}-{min(start_index + qr_per_frame, len(self.file_data['chunks']))}"
-        draw.text((matrix_width // 2, 25), header_text, fill="black", font=font, anchor="mm")
-        
-        chunks = self.file_data['chunks']
-        chunk_offset = 0
+    def _page_args(self, start_index, cols, rows, qr_per_frame, page_number, total_pages):
+        """_render_page に渡す引数（ワーカーへ送るためpickle可能な値のみ）"""
+        cache = self._module_cache
+        page_range = range(start_index, start_index + qr_per_frame)
+        return dict(
+            start_index=start_index,
+            page_chunks=self.file_data['chunks'][start_index:start_index + qr_per_frame],
+            cached_modules={i: cache[i] for i in page_range if i in cache},
+            cols=cols,
+            rows=rows,
+            page_number=page_number,
+            total_pages=total_pages,
+            qr_size=self.photo_optimized_qr_size,
+            chunk_template=self._chunk_template,
+            chunk_mode=self._chunk_mode,
+            chunk_version=self._chunk_version,
+            control_version=self._control_version,
+        )
         
-        # 各位置にQRコードを配置
-        for row in range(rows):
-            for col in range(cols):
-                x = col * qr_size + padding
-                y = row * qr_size + padding + 50  # ヘッダー分のオフセット
-                
-                # 4隅の制御QRコード
-                if (row == 0 and col == 0):  # 左上
-                    control_data = {
-                        "type": "control",
-                        "position": "top-left",
-                        "page": page_number,
-                        "total": total_pages,
-                        "timestamp": int(time.time())
-                    }
-                    qr = segno.make(json.dumps(control_data), error='m')
-                    buffer = BytesIO()
-                    qr.save(buffer, kind='png', scale=3, border=1, dark='blue', light='lightblue')
-                    buffer.seek(0)
-                    qr_img = Image.open(buffer)
-                    qr_img = qr_img.resize((qr_size - 10, qr_size - 10), Image.Resampling.NEAREST)
-                    matrix.paste(qr_img, (x + 5, y + 5))
-                    # ラベル
-                    draw.text((x + qr_size // 2, y + qr_size + 2), "制御-左上", fill="blue", font=small_font, anchor="mt")
-                    
-                elif (row == 0 and col == cols - 1):  # 右上
-                    control_data = {
-                        "type": "control",
-                        "position": "top-right",
-                        "page": page_number,
-                        "total": total_pages,
-                        "timestamp": int(time.time())
-                    }
-                    qr = segno.make(json.dumps(control_data), error='m')
-                    buffer = BytesIO()
-                    qr.save(buffer, kind='png', scale=3, border=1, dark='red', light='pink')
-                    buffer.seek(0)
-                    qr_img = Image.open(buffer)
-                    qr_img = qr_img.resize((qr_size - 10, qr_size - 10), Image.Resampling.NEAREST)
-                    matrix.paste(qr_img, (x + 5, y + 5))
-                    draw.text((x + qr_size // 2, y + qr_size + 2), "制御-右上", fill="red", font=small_font, anchor="mt")
-                    
-                elif (row == rows - 1 and col == 0):  # 左下
-                    control_data = {
-                        "type": "control",
-                        "position": "bottom-left",
-                        "page": page_number,
-                        "total": total_pages,
-                        "timestamp": int(time.time())
-                    }
-                    qr = segno.make(json.dumps(control_data), error='m')
-                    buffer = BytesIO()
-                    qr.save(buffer, kind='png', scale=3, border=1, dark='orange', light='#FFE5B4')
-                    buffer.seek(0)
-                    qr_img = Image.open(buffer)
-                    qr_img = qr_img.resize((qr_size - 10, qr_size - 10), Image.Resampling.NEAREST)
-                    matrix.paste(qr_img, (x + 5, y + 5))
-                    draw.text((x + qr_size // 2, y - 2), "制御-左下", fill="orange", font=small_font, anchor="mb")
-                    
-                elif (row == rows - 1 and col == cols - 1):  # 右下
-                    control_data = {
-                        "type": "control",
-                        "position": "bottom-right",
-                        "page": page_number,
-                        "total": total_pages,
-                        "timestamp": int(time.time())
-                    }
-                    qr = segno.make(json.dumps(control_data), error='m')
-                    buffer = BytesIO()
-                    qr.save(buffer, kind='png', scale=3, border=1, dark='green', light='lightgreen')
-                    buffer.seek(0)
-                    qr_img = Image.open(buffer)
-                    qr_img = qr_img.resize((qr_size - 10, qr_size - 10), Image.Resampling.NEAREST)
-                    matrix.paste(qr_img, (x + 5, y + 5))
-                    draw.text((x + qr_size // 2, y - 2), "制御-右下", fill="green", font=small_font, anchor="mb")
-                    
-                else:
-                    # 通常のチャンクQRコード
-                    chunk_index = start_index + chunk_offset
-                    if chunk_index < len(chunks):
-                        chunk_data = {
-                            "type": "chunk",
-                            "chunkIndex": chunk_index,
-                            "data": chunks[chunk_index]
-                        }
-                        
-                        qr = segno.make(json.dumps(chunk_data), error='h')
-                        buffer = BytesIO()
-                        qr.save(buffer, kind='png', scale=3, border=1)
-                        buffer.seek(0)
-                        qr_img = Image.open(buffer)
-                        qr_img = qr_img.resize((qr_size - 10, qr_size - 10), Image.Resampling.NEAREST)
-                        matrix.paste(qr_img, (x + 5, y + 5))
-                        
-                        # チャンク番号を表示
-                        draw.text((x + qr_size // 2, y + qr_size // 2), 
-                                str(chunk_index), 
-                                fill="red", font=font, anchor="mm")
-                        
-                        chunk_offset += 1
-                    else:
-                        # 空のスペースに「終了」マーク
-                        draw.rectangle([x + 5, y + 5, x + qr_size - 5, y + qr_size - 5], 
-                                     outline="gray", width=2)
-                        draw.text((x + qr_size // 2, y + qr_size // 2), 
-                                "空", fill="gray", font=font, anchor="mm")
+    def get_image(self, key):
+        """画像取得（'header' またはページ先頭のチャンク番号）"""
+        if key == 'header':
+            # ヘッダーは白黒のみなのでビットマップで保持（ページは制御QRが色付きのためRGB）
+            if self._header_photo is None and self._header is not None:
+                self._header_photo = _to_bitmap_image(self._header)
+            return self._header_photo
             
-        # グリッド線を描画（デバッグ用）
-        for i in range(cols + 1):
-            x = i * qr_size + padding
-            draw.line([(x, 50), (x, matrix_height)], fill="lightgray", width=1)
-        for i in range(rows + 1):
-            y = i * qr_size + padding + 50
-            draw.line([(0, y), (matrix_width, y)], fill="lightgray", width=1)
+        frames = self._frames
+        key = key // self._qr_per_page if self._qr_per_page else 0
+        photo = self._pages.get(key)
+        if photo is not None:
+            return photo
+        img = frames[key] if key < len(frames) else None
+        if img is None:
+            return None
             
-        return matrix
-        
-    def get_image(self, key):
-        """画像取得"""
-        with self.qr_images_lock:
-            return self.qr_images.get(key)
+        cached = self._photo_cache.get(key)
+        if cached and cached[0] is img:
+            self._photo_cache.move_to_end(key)
+            return cached[1]
             
+        # 追い出す最古のPhotoImage（表示中ではない）は作り直さずに使い回す
+        recycled = None
+        while len(self._photo_cache) >= self.photo_cache_size:
+            recycled = self._photo_cache.popitem(last=False)[1][1]
+        photo = _to_photo_image(img, recycled)
+        self._photo_cache[key] = (img, photo)
+        return photo
+            
+    def prebuild_pages(self):
+        """全ページのPhotoImageを事前作成（生成完了後にTkスレッドから呼ぶ）
+        
+        送信中のページ切り替えを辞書参照だけにする。prebuild_bytes に収まらない分は
+        従来どおり表示時に作成する。
+        """
+        self._pages = {}
+        budget = self.prebuild_bytes
+        for page, img in enumerate(self._frames):
+            if img is None:
+                continue
+            width, height = img.size
+            budget -= width * height * 4
+            if budget < 0:
+                break
+            self._pages[page] = _to_photo_image(img)
+        return len(self._pages)
+        
     def get_chunk_count(self):
         """チャンク数取得"""
         return len(self.file_data['chunks']) if self.file_data else 0
\ No newline at end of file
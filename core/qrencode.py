@@ -0,0 +1,77 @@
+"""
+libqrencode (C実装) の ctypes ラッパー（オプション）
+
+segno は Reed-Solomon 計算やマスク評価を Python で行うため、
+libqrencode でモジュール行列を生成できるようにする。
+実機の受信側での検証が済むまでは、環境変数 QR_USE_LIBQRENCODE=1 を指定した場合のみ使う。
+"""
+
+import os
+import ctypes
+import ctypes.util
+import numpy as np
+
+# QRecLevel
+EC_LEVELS = {'l': 0, 'm': 1, 'q': 2, 'h': 3}
+# QRencodeMode（8bitを指定すると数字/英数字区間は自動で最適化される）
+QR_MODE_8 = 2
+
+
+class _QRcode(ctypes.Structure):
+    _fields_ = [
+        ('version', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('data', ctypes.POINTER(ctypes.c_ubyte)),
+    ]
+
+
+def _load_library():
+    """libqrencode の読み込み（見つからなければNone）"""
+    for name in ('qrencode', 'libqrencode'):
+        path = ctypes.util.find_library(name)
+        if not path:
+            continue
+        try:
+            lib = ctypes.CDLL(path)
+        except OSError:
+            continue
+        lib.QRcode_encodeString.restype = ctypes.POINTER(_QRcode)
+        lib.QRcode_encodeString.argtypes = [
+            ctypes.c_char_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int
+        ]
+        lib.QRcode_encodeData.restype = ctypes.POINTER(_QRcode)
+        lib.QRcode_encodeData.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_int
+        ]
+        lib.QRcode_free.restype = None
+        lib.QRcode_free.argtypes = [ctypes.POINTER(_QRcode)]
+        return lib
+    return None
+
+
+# 明示的に有効化した場合のみ読み込む（既定は segno）
+ENABLED = os.environ.get('QR_USE_LIBQRENCODE') == '1'
+_lib = _load_library() if ENABLED else None
+HAS_QRENCODE = _lib is not None
+
+
+def encode_matrix(payload: str, error='m', version=0):
+    """モジュール行列（1=暗）を side x side の uint8 配列で返す。失敗時はNone
+    
+    version は最小バージョン（0で自動選択）。
+    bytes はNULを含みうるため長さ指定の8bitデータとしてそのまま格納する。
+    """
+    level = EC_LEVELS[error.lower()]
+    if isinstance(payload, bytes):
+        code = _lib.QRcode_encodeData(len(payload), payload, version, level)
+    else:
+        code = _lib.QRcode_encodeString(payload.encode('utf-8'), version, level, QR_MODE_8, 1)
+    if not code:
+        return None
+    try:
+        width = code.contents.width
+        data = np.ctypeslib.as_array(code.contents.data, shape=(width * width,))
+        # 下位1bitが暗モジュール、上位bitは機能パターン等の付加情報
+        return (data & 1).reshape(width, width)
+    finally:
+        _lib.QRcode_free(code)
@@ -3,108 +3,138 @@
 """
 
 import time
-import threading
 import tkinter as tk
 from typing import Callable
+from utils.precise_sleep import precise_sleep_until
+
+# afterは数ms遅れうるため、この時間だけ早めに起きて残りを高精度スリープで合わせる
+PRECISE_WINDOW_NS = 20_000_000
+# 進捗表示の更新間隔の下限（ページ周期を短くしてもステータスバーの再描画は最大4Hz）
+PROGRESS_INTERVAL_NS = 250_000_000
 
 class TransmissionController:
     def __init__(self):
         self.is_transmitting = False
         self.current_index = 0
         self.cycle_count = 0
-        self.transmission_thread = None
+        # ページ切り替えはTkのafterで予約する（送信用のスレッドは持たない）
+        self._after_id = None
+        self._qr_generator = None
+        self._qr_canvas = None
+        self._progress_callback = None
+        # ページごとの (先頭チャンク番号, 進捗, 状態表示（サイクル数以外）)
+        self._pages = []
+        self._page_index = 0
+        self._page_interval_ns = 0
+        # 次ページの絶対時刻（経過時間ではなく期限で待つので位相がずれない）
+        self._next_deadline = 0
+        # 最後に進捗を通知した時刻（Noneは未通知）
+        self._last_progress_ns = None
+
+    def start(self, qr_generator, qr_canvas, layout, fps, progress_callback):
+        """送信開始（無限ループ）。開始した場合True
         
-    def start(self, qr_generator, qr_canvas, fps, progress_callback):
-        """送信開始（無限ループ）"""
+        layout はページを生成したときの page_layout() の結果（送信時にキャンバスを測り直さない）。
+        """
         if self.is_transmitting:
-            return
-            
+            return False
+
+        # 周期は整数ナノ秒で扱い、浮動小数の丸め誤差を積み上げない
+        frame_interval_ns = round(1_000_000_000 / fps)
+        matrix_duration = fps * 3  # 各ページ3秒表示
+        # ページ内で表示は変わらないため、ページの切り替え時刻にだけ起きる
+        self._page_interval_ns = matrix_duration * frame_interval_ns
+
+        # 写真モードのページ構成（4隅の制御QR分を除いたデータQR数）
+        max_cols, max_rows, adjusted_qr_per_frame, total_pages = layout
+        chunk_count = qr_generator.get_chunk_count()
+
+        print(f"=== 送信設定 ===")
+        print(f"グリッド: {max_cols}x{max_rows} = {max_cols * max_rows}個")
+        print(f"データQR/ページ: {adjusted_qr_per_frame}個")
+        print(f"総ページ数: {total_pages}")
+
+        # ページごとの表示内容は一度だけ組み立てる
+        self._pages = [
+            (start, (page + 1) / total_pages * 100,
+             f"ページ {page + 1}/{total_pages} - チャンク: {start + 1}-{min(start + adjusted_qr_per_frame, chunk_count)} / {chunk_count}")
+            for page, start in enumerate(range(0, chunk_count, adjusted_qr_per_frame))
+        ]
+        if not self._pages:
+            return False
+
         self.is_transmitting = True
         self.current_index = 0
         self.cycle_count = 0
-        
-        self.transmission_thread = threading.Thread(
-            target=self._transmission_loop,
-            args=(qr_generator, qr_canvas, fps, progress_callback)
-        )
-        self.transmission_thread.daemon = True
-        self.transmission_thread.start()
-        
+        self._page_index = 0
+        self._qr_generator = qr_generator
+        self._qr_canvas = qr_canvas
+        self._progress_callback = progress_callback
+        self._last_progress_ns = None
+        self._next_deadline = time.monotonic_ns()
+        self._tick()
+        return True
+
     def stop(self):
-        """送信停止"""
+        """送信停止（予約済みのページ切り替えを取り消す）"""
         self.is_transmitting = False
         self.current_index = 0
         self.cycle_count = 0
+        if self._after_id is not None:
+            self._qr_canvas.canvas.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _tick(self):
+        """ページ切り替え（Tkスレッドで実行し、次の切り替えを予約する）"""
+        self._after_id = None
+        if not self.is_transmitting:
+            return
+
+        # 少し早めに起きているので、切り替え時刻ちょうどまで待つ
+        precise_sleep_until(self._next_deadline)
+
+        # チャンクマトリックス表示と進捗更新
+        start, progress, status_prefix = self._pages[self._page_index]
+        self.current_index = start
+        self._display_matrix(self._qr_generator, self._qr_canvas, start)
+        # 進捗は間引いて通知（最初と各サイクルの最終ページは必ず通知する）
+        now = time.monotonic_ns()
+        if (self._last_progress_ns is None
+                or self._page_index == len(self._pages) - 1
+                or now - self._last_progress_ns >= PROGRESS_INTERVAL_NS):
+            self._last_progress_ns = now
+            self._progress_callback(progress, f"{status_prefix} (サイクル: {self.cycle_count + 1})")
+
+        self._page_index += 1
+        if self._page_index == len(self._pages):
+            # 一巡完了、最初に戻る
+            self._page_index = 0
+            self.cycle_count += 1
+
+        # 次ページの予約
+        self._next_deadline += self._page_interval_ns
+        now = time.monotonic_ns()
+        if self._next_deadline <= now:
+            # 処理が周期を超過した場合は現在時刻に合わせ直す
+            self._next_deadline = now
+        delay_ms = max(0, (self._next_deadline - now - PRECISE_WINDOW_NS) // 1_000_000)
+        self._after_id = self._qr_canvas.canvas.after(delay_ms, self._tick)
 
-    def _transmission_loop(self, qr_generator, qr_canvas, fps, progress_callback):
-        """送信ループ（制御QR付きマトリックスを表示）"""
-        frame_interval = 1.0 / fps
-        matrix_duration = fps * 3  # 各ページ3秒表示
-        
-        # 写真モード用の設定を取得
-        cols, rows, qr_per_frame = qr_canvas.get_matrix_size(photo_mode=True)
-        
-        # 実際のグリッドサイズを使用
-        max_cols = max(5, cols)
-        max_rows = max(4, rows)
-        actual_qr_per_frame = max_cols * max_rows
-        
-        # 4隅の制御QR分を引く
-        adjusted_qr_per_frame = actual_qr_per_frame - 4
-        chunk_count = qr_generator.get_chunk_count()
-        total_pages = (chunk_count + adjusted_qr_per_frame - 1) // adjusted_qr_per_frame
-        
-        print(f"=== 送信設定 ===")
-        print(f"グリッド: {max_cols}x{max_rows} = {actual_qr_per_frame}個")
-        print(f"データQR/ページ: {adjusted_qr_per_frame}個")
-        print(f"総ページ数: {total_pages}")
-        
-        matrix_count = 0
-        
-        while self.is_transmitting:
-            start_time = time.time()
-            
-            # チャンクマトリックス表示
-            if matrix_count == 0:
-                self._display_matrix(qr_generator, qr_canvas, self.current_index)
-                
-                # 進捗更新
-                chunk_end = min(self.current_index + adjusted_qr_per_frame, chunk_count)
-                progress = ((self.current_index // adjusted_qr_per_frame) + 1) / total_pages * 100
-                page_number = (self.current_index // adjusted_qr_per_frame) + 1
-                
-                status = f"ページ {page_number}/{total_pages} - チャンク: {self.current_index + 1}-{chunk_end} / {chunk_count} (サイクル: {self.cycle_count + 1})"
-                progress_callback(progress, status)
-                
-            matrix_count += 1
-            
-            if matrix_count >= matrix_duration:
-                self.current_index += adjusted_qr_per_frame
-                matrix_count = 0
-                
-                if self.current_index >= chunk_count:
-                    # 一巡完了、最初に戻る
-                    self.current_index = 0
-                    self.cycle_count += 1
-                    
-            # フレームレート調整
-            elapsed = time.time() - start_time
-            sleep_time = max(0, frame_interval - elapsed)
-            time.sleep(sleep_time)
-            
     def _display_matrix(self, qr_generator, qr_canvas, index):
-        """マトリックス表示"""
-        qr_canvas.clear()
+        """マトリックス表示（表示中の画像とテキストを差し替える）"""
         matrix_img = qr_generator.get_image(index)
-        if matrix_img:
-            # 写真モード：画面中央に配置
-            x, y = qr_canvas.get_center()
-            qr_canvas.display_image(matrix_img, x, y)
-            
-            # 制御QRコードの説明
-            qr_canvas.display_text(
-                x, 30,
-                "📸 青と緑の制御QRコードが両方見えるようにiPhoneを向けてください",
-                ('Arial', 16, 'bold'),
-                'black'
-            )
\ No newline at end of file
+        if not matrix_img:
+            qr_canvas.clear()
+            return
+
+        # 写真モード：画面中央に配置
+        x, y = qr_canvas.get_center()
+        qr_canvas.display_image(matrix_img, x, y)
+
+        # 制御QRコードの説明
+        qr_canvas.display_text(
+            x, 30,
+            "📸 青と緑の制御QRコードが両方見えるようにiPhoneを向けてください",
+            ('Arial', 16, 'bold'),
+            'black'
+        )
@@ -134,11 +134,28 @@ class QRDisplayCanvas:
         )
         self.canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
+        # 表示用の画像/テキストは常設し、内容と位置の差し替えだけで切り替える
+        self._image_id = self.canvas.create_image(0, 0, state=tk.HIDDEN)
+        self._text_id = self.canvas.create_text(0, 0, state=tk.HIDDEN)
+        # 表示中のテキストの内容 (x, y, text, font, fill) と表示状態
+        self._text_state = None
+        self._text_visible = False
+        
+        # キャンバスの寸法は<Configure>で更新したものを使う（取得のたびにupdate()しない）
+        self.canvas.update_idletasks()
+        self._width = self.canvas.winfo_width()
+        self._height = self.canvas.winfo_height()
+        self.canvas.bind('<Configure>', self._on_resize)
+        
+    def _on_resize(self, event):
+        """キャンバスのサイズ変更"""
+        self._width = event.width
+        self._height = event.height
+        
     def get_matrix_size(self, photo_mode=False):
         """マトリックスサイズ取得"""
-        self.canvas.update()
-        width = self.canvas.winfo_width() - 40
-        height = self.canvas.winfo_height() - 40
+        width = self._width - 40
+        height = self._height - 40
         
         if photo_mode:
             # 写真モード：より小さいQRコードでより多く表示
@@ -153,23 +170,32 @@ class QRDisplayCanvas:
         return cols, rows, cols * rows
         
     def clear(self):
-        """キャンバスクリア"""
-        self.canvas.delete("all")
+        """キャンバスクリア（常設アイテムは非表示にするだけ）"""
+        self.canvas.itemconfig(self._image_id, state=tk.HIDDEN)
+        self.canvas.itemconfig(self._text_id, state=tk.HIDDEN)
+        self._text_visible = False
         
     def display_image(self, image, x, y, anchor='center'):
-        """画像表示"""
+        """画像表示（常設の画像アイテムを差し替え、作り直さない）"""
         if isinstance(anchor, str):
             anchor = anchor.lower()
-        self.canvas.create_image(x, y, image=image, anchor=anchor)
+        self.canvas.coords(self._image_id, x, y)
+        self.canvas.itemconfig(self._image_id, image=image, anchor=anchor, state=tk.NORMAL)
         
     def display_text(self, x, y, text, font, fill='black'):
-        """テキスト表示"""
-        self.canvas.create_text(x, y, text=text, font=font, fill=fill)
+        """テキスト表示（常設のテキストアイテムを内容が変わったときだけ差し替え）"""
+        state = (x, y, text, font, fill)
+        if state != self._text_state:
+            self._text_state = state
+            self.canvas.coords(self._text_id, x, y)
+            self.canvas.itemconfig(self._text_id, text=text, font=font, fill=fill)
+        if not self._text_visible:
+            self._text_visible = True
+            self.canvas.itemconfig(self._text_id, state=tk.NORMAL)
         
     def get_center(self):
         """中心座標取得"""
-        self.canvas.update()
-        return self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2
+        return self._width // 2, self._height // 2
 
 
 class StatusBar:
@@ -3,7 +3,7 @@
 """
 
 import tkinter as tk
-from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
 from .components import ControlPanel, QRDisplayCanvas, StatusBar
 from utils.helpers import format_size
 
@@ -13,6 +13,11 @@ class MainWindow:
         self.file_processor = file_processor
         self.qr_generator = qr_generator
         self.transmission_controller = transmission_controller
+        # 生成中/生成済みのQRのページ構成（ファイル選択ごとに一度だけ計算）
+        self._layout = None
+        # ファイルの読み込み＋圧縮はTkスレッドを塞がないよう別スレッドで行う
+        self._io_pool = ThreadPoolExecutor(max_workers=1)
+        self._file_future = None
         
         # フルスクリーン設定
         self.window.state('zoomed')
@@ -37,6 +42,9 @@ class MainWindow:
             self.on_start_transmission,
             self.on_stop_transmission
         )
+        # チャンクサイズは選択が変わったときだけ読み取る
+        self._chunk_size = int(self.control_panel.chunk_size_var.get())
+        self.control_panel.chunk_size_var.trace_add('write', self._on_chunk_size_changed)
         
         # QRコード表示エリア
         self.qr_canvas = QRDisplayCanvas(self.main_frame)
@@ -45,98 +53,153 @@ class MainWindow:
         self.status_bar = StatusBar(self.main_frame, self.screen_width)
         
         # ESCキーで終了
-        self.window.bind('<Escape>', lambda e: self.window.quit())
+        self.window.bind('<Escape>', self._on_escape)
+        
+    def _on_escape(self, event):
+        """ESCキー押下時の処理"""
+        self.window.quit()
+        
+    def _on_chunk_size_changed(self, *args):
+        """チャンクサイズ選択の変更"""
+        self._chunk_size = int(self.control_panel.chunk_size_var.get())
         
     def on_file_selected(self, file_path):
-        """ファイル選択時の処理"""
+        """ファイル選択時の処理（処理完了は _poll_file_result で受け取る）"""
+        if self._file_future is not None:
+            return
         # チャンクサイズを更新
-        self.file_processor.chunk_size = int(self.control_panel.chunk_size_var.get())
-        result = self.file_processor.process_file(file_path)
-        if result:
-            # ファイルサイズ情報を表示
-            size_info = f"元: {format_size(result['original_size'])} → 圧縮: {format_size(result['compressed_size'])} " \
-                       f"({100 - (result['compressed_size'] / result['original_size'] * 100):.1f}%削減)"
-            self.status_bar.progress_label.config(text=size_info)
-            
-            # QRコード生成前に総ページ数を計算
-            cols, rows, qr_per_frame = self.qr_canvas.get_matrix_size(photo_mode=True)
-            max_cols = max(5, cols)
-            max_rows = max(4, rows)
-            actual_qr_per_frame = max_cols * max_rows
-            adjusted_qr_per_frame = actual_qr_per_frame - 4  # 4隅の制御QR分を引く
-            total_pages = (len(result['chunks']) + adjusted_qr_per_frame - 1) // adjusted_qr_per_frame
+        self.file_processor.chunk_size = self._chunk_size
+        self.control_panel.select_btn.config(state=tk.DISABLED)
+        self.status_bar.set_status("ファイル処理中...", "#2196F3")
+        self._file_future = self._io_pool.submit(self.file_processor.process_file, file_path)
+        self.window.after(20, self._poll_file_result)
+        
+    def _poll_file_result(self):
+        """ファイル処理結果の取り込み（Tkスレッドで定期実行）"""
+        if not self._file_future.done():
+            self.window.after(20, self._poll_file_result)
+            return
+        result = self._file_future.result()
+        self._file_future = None
+        # QR生成が始まった場合、ファイル選択は生成が終わるまで無効のままにする
+        if not self._on_file_ready(result):
+            self.control_panel.select_btn.config(state=tk.NORMAL)
+        
+    def _on_file_ready(self, result):
+        """ファイル処理完了時の処理（QR生成を開始した場合True）"""
+        if not result:
+            self.status_bar.set_status("ファイル処理に失敗しました", "#f44336")
+            return False
+        if not self.qr_generator.set_file_data(result):
+            self.status_bar.set_status("QR生成中のためファイルを変更できません", "#f44336")
+            return False
             
-            self.status_bar.set_status(
-                f"準備完了: {len(result['chunks'])}チャンク / {total_pages}ページ", 
-                "#4CAF50"
-            )
+        # ファイルサイズ情報を表示
+        original_size = result['original_size']
+        compressed_size = result['compressed_size']
+        # 空ファイルは削減率0%として表示
+        reduction = 100.0 - 100.0 * compressed_size / original_size if original_size else 0.0
+        size_info = (f"元: {format_size(original_size)} → "
+                     f"圧縮: {format_size(compressed_size)} "
+                     f"({reduction:.1f}%削減)")
+        self.status_bar.progress_label.config(text=size_info)
+        
+        # QRコード生成前に総ページ数を計算
+        matrix_size = self.qr_canvas.get_matrix_size(photo_mode=True)
+        self._layout = self.qr_generator.page_layout(matrix_size, len(result['chunks']))
+        total_pages = self._layout[3]
+        
+        self.status_bar.set_status(
+            f"準備完了: {len(result['chunks'])}チャンク / {total_pages}ページ", 
+            "#4CAF50"
+        )
+        
+        started = self.qr_generator.generate_all_qrcodes(
+            matrix_size,
+            self.on_generation_progress,
+            self.on_generation_complete,
+            self.on_page_ready
+        )
+        if started:
+            self.window.after(10, self._drain_generated)
+        return started
             
-            self.qr_generator.set_file_data(result)
-            self.qr_generator.generate_all_qrcodes(
-                self.qr_canvas.get_matrix_size(photo_mode=True),
-                self.on_generation_progress,
-                self.on_generation_complete
-            )
+    def _drain_generated(self):
+        """生成済みQR画像の取り込み（Tkスレッドで定期実行）"""
+        if self.qr_generator.drain_pending():
+            self.window.after(10, self._drain_generated)
+        else:
+            # 生成終了（成否を問わず）でファイル選択を再び有効化
+            self.control_panel.select_btn.config(state=tk.NORMAL)
             
     def on_generation_progress(self, progress, message):
         """QRコード生成進捗"""
         self.status_bar.update_generation_progress(progress, message)
         
+    def on_page_ready(self, key):
+        """画像1枚の生成完了（ページの生成を待たずにヘッダーを表示）"""
+        if key == 'header':
+            # 初期表示（ヘッダー）
+            self._display_header()
+            
     def on_generation_complete(self):
         """QRコード生成完了"""
+        # 送信中にPhotoImage変換が走らないよう全ページを事前作成
+        self.qr_generator.prebuild_pages()
         self.control_panel.enable_transmission()
         self.status_bar.set_status("送信準備完了", "#4CAF50")
-        # 初期表示（ヘッダー）
-        self._display_header()
         
     def on_start_transmission(self, fps):
         """送信開始（制御QR付きマトリックスを直接表示）"""
-        self.transmission_controller.start(
+        started = self.transmission_controller.start(
             self.qr_generator,
             self.qr_canvas,
+            self._layout,
             fps,
             self.on_transmission_progress
         )
-        # ボタン状態更新
-        self.control_panel.start_btn.config(state=tk.DISABLED)
-        self.control_panel.stop_btn.config(state=tk.NORMAL)
+        if not started:
+            # 送信するページがない（空ファイル等）場合は待機状態のまま
+            self.status_bar.set_status("送信するデータがありません", "#f44336")
+            return
+        self._set_transmission_buttons(True)
         self.status_bar.set_status("送信中...", "#2196F3")
 
     def on_stop_transmission(self):
         """送信停止（手動）"""
         self.transmission_controller.stop()
-        # ボタン状態更新
-        self.control_panel.start_btn.config(state=tk.NORMAL)
-        self.control_panel.stop_btn.config(state=tk.DISABLED)
+        self._set_transmission_buttons(False)
         # ヘッダー表示に戻る
         self._display_header()
         self.status_bar.set_status("待機中", "#666")
         self.status_bar.update_progress(0, "")
 
+    def _set_transmission_buttons(self, running):
+        """送信開始/停止ボタンの状態更新"""
+        start_state, stop_state = (tk.DISABLED, tk.NORMAL) if running else (tk.NORMAL, tk.DISABLED)
+        self.control_panel.start_btn.config(state=start_state)
+        self.control_panel.stop_btn.config(state=stop_state)
+        
     def on_transmission_progress(self, progress, status):
         """送信進捗"""
         self.status_bar.update_progress(progress, status)
         
     def _display_header(self):
-        """ヘッダー表示"""
-        self.qr_canvas.clear()
+        """ヘッダー表示（常設の画像/テキストを差し替えるだけなので、表示できるときはクリア不要）"""
         header_img = self.qr_generator.get_image('header')
-        if header_img:
-            x, y = self.qr_canvas.get_center()
-            self.qr_canvas.display_image(header_img, x, y)
+        if not header_img:
+            self.qr_canvas.clear()
+            return
             
-            # 総ページ数を含むメッセージ
-            cols, rows, qr_per_frame = self.qr_canvas.get_matrix_size(photo_mode=True)
-            max_cols = max(5, cols)
-            max_rows = max(4, rows)
-            actual_qr_per_frame = max_cols * max_rows
-            adjusted_qr_per_frame = actual_qr_per_frame - 4
-            chunk_count = self.qr_generator.get_chunk_count()
-            total_pages = (chunk_count + adjusted_qr_per_frame - 1) // adjusted_qr_per_frame
-            
-            self.qr_canvas.display_text(
-                x, y + 320,
-                f"📱 ヘッダー情報 - iPhoneでスキャンしてください\n（全{total_pages}ページ）",
-                ('Arial', 20, 'bold'),
-                'red'
-            )
\ No newline at end of file
+        x, y = self.qr_canvas.get_center()
+        self.qr_canvas.display_image(header_img, x, y)
+        
+        # 総ページ数を含むメッセージ（ヘッダーQRに埋め込んだものと同じ値）
+        total_pages = self._layout[3]
+        
+        self.qr_canvas.display_text(
+            x, y + 320,
+            f"📱 ヘッダー情報 - iPhoneでスキャンしてください\n（全{total_pages}ページ）",
+            ('Arial', 20, 'bold'),
+            'red'
+        )
@@ -2,10 +2,12 @@
 ユーティリティ関数
 """
 
-def format_size(bytes: int) -> str:
-    """ファイルサイズフォーマット"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes < 1024.0:
-            return f"{bytes:.1f} {unit}"
-        bytes /= 1024.0
-    return f"{bytes:.1f} TB"
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+
+def format_size(n: int) -> str:
+    """ファイルサイズフォーマット（ビット長から単位を直接決める）"""
+    if n < 1024:
+        return f"{n:.1f} B"
+    unit = min((int(n).bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    return f"{n / (1 << (unit * 10)):.1f} {SIZE_UNITS[unit]}"
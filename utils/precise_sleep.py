@@ -0,0 +1,108 @@
+"""
+高精度スリープ（フレーム送出の周期合わせ用）
+
+time.sleep は環境によって約15msの粒度で丸められるため、
+OSの高分解能タイマーで time.monotonic_ns() 基準の絶対時刻まで待つ。
+"""
+
+import sys
+import time
+import ctypes
+import ctypes.util
+import threading
+
+NS_PER_SEC = 1_000_000_000
+
+_local = threading.local()
+
+
+if sys.platform == 'win32':
+    from ctypes import wintypes
+
+    CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x00000002
+    TIMER_ALL_ACCESS = 0x1F0003
+    INFINITE = 0xFFFFFFFF
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.CreateWaitableTimerExW.restype = wintypes.HANDLE
+    _kernel32.CreateWaitableTimerExW.argtypes = [
+        ctypes.c_void_p, wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD
+    ]
+    _kernel32.SetWaitableTimer.restype = wintypes.BOOL
+    _kernel32.SetWaitableTimer.argtypes = [
+        wintypes.HANDLE, ctypes.POINTER(wintypes.LARGE_INTEGER), wintypes.LONG,
+        ctypes.c_void_p, ctypes.c_void_p, wintypes.BOOL
+    ]
+    _kernel32.WaitForSingleObject.restype = wintypes.DWORD
+    _kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+
+    def _timer():
+        """スレッドごとの高分解能タイマー（Windows 10 1803より前は通常のタイマー）"""
+        handle = getattr(_local, 'timer', None)
+        if handle is None:
+            handle = _kernel32.CreateWaitableTimerExW(
+                None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION, TIMER_ALL_ACCESS
+            )
+            if not handle:
+                handle = _kernel32.CreateWaitableTimerExW(None, None, 0, TIMER_ALL_ACCESS)
+            _local.timer = handle
+        return handle
+
+    def _sleep_until(deadline_ns):
+        remaining = deadline_ns - time.monotonic_ns()
+        if remaining <= 0:
+            return True
+        handle = _timer()
+        if not handle:
+            return False
+        # 負の値は相対時間（100ns単位）
+        due = wintypes.LARGE_INTEGER(-max(1, remaining // 100))
+        if not _kernel32.SetWaitableTimer(handle, ctypes.byref(due), 0, None, None, False):
+            return False
+        _kernel32.WaitForSingleObject(handle, INFINITE)
+        return True
+
+    HAS_PRECISE_SLEEP = True
+
+else:
+    CLOCK_MONOTONIC = 1
+    TIMER_ABSTIME = 1
+    EINTR = 4
+
+    class _Timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    def _load_clock_nanosleep():
+        """clock_nanosleep の読み込み（macOS等で無ければNone）"""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            func = libc.clock_nanosleep
+        except (OSError, AttributeError, TypeError):
+            return None
+        func.restype = ctypes.c_int
+        func.argtypes = [
+            ctypes.c_int, ctypes.c_int, ctypes.POINTER(_Timespec), ctypes.POINTER(_Timespec)
+        ]
+        return func
+
+    _clock_nanosleep = _load_clock_nanosleep()
+
+    def _sleep_until(deadline_ns):
+        # time.monotonic_ns() はLinuxでは CLOCK_MONOTONIC なので絶対時刻をそのまま渡せる
+        sec, nsec = divmod(deadline_ns, NS_PER_SEC)
+        ts = _Timespec(sec, nsec)
+        while True:
+            ret = _clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, ctypes.byref(ts), None)
+            if ret != EINTR:
+                return ret == 0
+
+    HAS_PRECISE_SLEEP = sys.platform.startswith('linux') and _clock_nanosleep is not None
+
+
+def precise_sleep_until(deadline_ns: int):
+    """time.monotonic_ns() 基準の絶対時刻 deadline_ns まで待つ"""
+    if HAS_PRECISE_SLEEP and _sleep_until(deadline_ns):
+        return
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > 0:
+        time.sleep(remaining / NS_PER_SEC)